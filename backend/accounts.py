@@ -0,0 +1,186 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from kiteconnect import KiteConnect
+
+import resilience
+from response_cache import ResponseCache
+
+DEFAULT_ACCOUNT = "default"
+ACCOUNTS_FILE = "accounts.json"
+LOGIN_STATE_TTL = 600
+
+# Requests per second per account, by Kite API family (https://kite.trade/docs/connect/v3/exceptions/#api-rate-limit)
+RATE_LIMITS = {
+    "quote": 1,
+    "historical": 3,
+    "orders": 10,
+    "default": 10,
+}
+ORDER_METHODS = {"place_order", "modify_order", "cancel_order", "place_gtt", "modify_gtt", "delete_gtt"}
+QUOTE_METHODS = {"quote", "ltp", "ohlc"}
+
+
+class RateBudget:
+    def __init__(self, limits: dict = RATE_LIMITS):
+        # Token bucket per API family; each account gets its own so one busy account cannot starve the rest
+        self.limits = limits
+        self._tokens = {kind: float(rate) for kind, rate in limits.items()}
+        self._updated = {kind: time.monotonic() for kind in limits}
+        self._lock = threading.Lock()
+
+    def acquire(self, kind: str = "default"):
+        kind = kind if kind in self.limits else "default"
+        rate = self.limits[kind]
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens[kind] = min(rate, self._tokens[kind] + (now - self._updated[kind]) * rate)
+                self._updated[kind] = now
+                if self._tokens[kind] >= 1:
+                    self._tokens[kind] -= 1
+                    return
+                wait = (1 - self._tokens[kind]) / rate
+            time.sleep(wait)
+
+
+class RateLimitedKite:
+    # Thin proxy so every call through a pooled session draws from its account's budget
+    def __init__(self, kite: KiteConnect, budget: RateBudget):
+        self._kite = kite
+        self._budget = budget
+
+    def __getattr__(self, name):
+        attr = getattr(self._kite, name)
+        if not callable(attr) or name.startswith("_") or name in ("login_url", "set_access_token"):
+            return attr
+
+        kind = "orders" if name in ORDER_METHODS else "quote" if name in QUOTE_METHODS else "default"
+
+        def limited(*args, **kwargs):
+            self._budget.acquire(kind)
+            return attr(*args, **kwargs)
+
+        return limited
+
+
+class Account:
+    def __init__(self, account_id: str, api_key: str, api_secret: str, token_file: str, strategy: bool = False,
+                 api_token: str = None):
+        self.id = account_id
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.api_token = api_token
+        self.token_file = token_file
+        self.strategy = strategy
+        self.budget = RateBudget()
+        # Account-private data (positions, orders) only; market data lives in the shared caches
+        self.cache = ResponseCache()
+        self._session = None
+        self._token_mtime = None
+        self._lock = threading.Lock()
+
+    def _read_token(self):
+        try:
+            with open(self.token_file) as f:
+                return json.load(f)["access_token"]
+        except Exception:
+            # fallback to env if file not found
+            return os.getenv("KITE_ACCESS_TOKEN") if self.id == DEFAULT_ACCOUNT else None
+
+    def kite(self) -> RateLimitedKite:
+        # One reusable session per account, rebuilt only when the token file changes on disk
+        mtime = os.path.getmtime(self.token_file) if os.path.exists(self.token_file) else None
+        with self._lock:
+            if self._session is None or mtime != self._token_mtime:
+                kite = KiteConnect(api_key=self.api_key, timeout=resilience.BROKER_TIMEOUT)
+                access_token = self._read_token()
+                if access_token:
+                    kite.set_access_token(access_token)
+                self._session = RateLimitedKite(kite, self.budget)
+                self._token_mtime = mtime
+            return self._session
+
+    @property
+    def requires_auth(self) -> bool:
+        # Only the legacy single-account setup (default account, no API_TOKEN) is left open
+        return self.id != DEFAULT_ACCOUNT or bool(self.api_token)
+
+    def authorize(self, token: str) -> bool:
+        if not self.requires_auth:
+            return True
+        if not self.api_token or not token:
+            return False
+        return hmac.compare_digest(self.api_token, token)
+
+    def _sign(self, message: str) -> str:
+        return hmac.new((self.api_secret or "").encode(), message.encode(), hashlib.sha256).hexdigest()
+
+    def login_state(self) -> str:
+        # Carried through Kite's redirect_params so the callback can prove the login was started by us
+        issued = str(int(time.time()))
+        return f"{issued}.{self._sign(f'{self.id}:{issued}')}"
+
+    def verify_login_state(self, state: str) -> bool:
+        if not self.api_secret or not state or "." not in state:
+            return False
+        issued, signature = state.split(".", 1)
+        if not issued.isdigit() or time.time() - int(issued) > LOGIN_STATE_TTL:
+            return False
+        return hmac.compare_digest(signature, self._sign(f"{self.id}:{issued}"))
+
+    def login_client(self) -> KiteConnect:
+        return KiteConnect(api_key=self.api_key, timeout=resilience.BROKER_TIMEOUT)
+
+    def save_token(self, access_token: str, generated_at: str):
+        with open(self.token_file, "w") as f:
+            json.dump({"access_token": access_token, "generated_at": generated_at}, f)
+
+
+class AccountRegistry:
+    def __init__(self, accounts_file: str = None):
+        self.accounts_file = accounts_file
+        self._accounts = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        # Loaded lazily so .env has been read by the time credentials are resolved
+        accounts_file = self.accounts_file or os.getenv("ACCOUNTS_FILE", ACCOUNTS_FILE)
+        accounts = {
+            DEFAULT_ACCOUNT: Account(DEFAULT_ACCOUNT, os.getenv("KITE_API_KEY"), os.getenv("KITE_API_SECRET"),
+                                     "kite_token.json", strategy=True, api_token=os.getenv("API_TOKEN")),
+        }
+        if os.path.exists(accounts_file):
+            with open(accounts_file) as f:
+                for entry in json.load(f):
+                    # Secrets are referenced by env var name so accounts.json can be committed safely
+                    accounts[entry["id"]] = Account(
+                        entry["id"],
+                        os.getenv(entry["api_key_env"]),
+                        os.getenv(entry["api_secret_env"]),
+                        entry.get("token_file", f"kite_token_{entry['id']}.json"),
+                        strategy=entry.get("strategy", False),
+                        # Without a configured token the account refuses every request
+                        api_token=os.getenv(entry.get("api_token_env", "")),
+                    )
+        return accounts
+
+    def all(self) -> list[Account]:
+        with self._lock:
+            if self._accounts is None:
+                self._accounts = self._load()
+            return list(self._accounts.values())
+
+    def get(self, account_id: str = None) -> Account:
+        account_id = account_id or DEFAULT_ACCOUNT
+        for account in self.all():
+            if account.id == account_id:
+                return account
+        raise KeyError(f"Unknown account: {account_id}")
+
+
+REGISTRY = AccountRegistry()
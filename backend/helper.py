@@ -8,8 +8,16 @@ import re
 from datetime import date, timedelta
 import calendar
 import time
+import threading
 import mock
 import json
+import kite_helpers
+import pricing
+import resilience
+import iv_surface
+import accounts
+from models import OptionChain, Position
+from response_cache import ResponseCache
 
 MONTH_MAP = {"JAN":1,"FEB":2,"MAR":3,"APR":4,"MAY":5,"JUN":6,
              "JUL":7,"AUG":8,"SEP":9,"OCT":10,"NOV":11,"DEC":12}
@@ -22,86 +30,131 @@ kite.set_access_token(os.getenv("KITE_ACCESS_TOKEN"))
 
 load_dotenv()
 
-def get_kite():
-    api_key = os.getenv("KITE_API_KEY")
-    kite = KiteConnect(api_key=api_key)
-    try:
-        with open("kite_token.json") as f:
-            access_token = json.load(f)["access_token"]
-        print(access_token)
-        kite.set_access_token(access_token)
-    except Exception:
-        # fallback to env if file not found
-        kite.set_access_token(os.getenv("KITE_ACCESS_TOKEN"))
-    return kite
+def get_kite(account_id=None):
+    # Pooled, rate-limited session for the account; see accounts.py
+    return accounts.REGISTRY.get(account_id).kite()
 
+# Dhan only serves public market data here, so one client is shared by every account
 api = dhanhq(client_id=os.getenv("DHAN_CLIENT_ID"), 
              access_token=os.getenv("DHAN_ACCESS_TOKEN"))
+# dhanhq defaults to a 60s HTTP timeout; match the pool timeout so a stuck request gives its worker back
+api.timeout = resilience.BROKER_TIMEOUT
 
-def get_expiry_list() -> list[str]:
+def _dhan_data(response: dict):
+    # dhanhq reports failures in the payload instead of raising
+    if response.get("status") != "success":
+        raise resilience.BrokerError(f"Dhan request failed: {response.get('remarks') or response.get('data')}")
+    return response.get("data").get("data")
+
+def _fetch_expiry_list() -> list[str]:
     response = api.expiry_list(under_security_id=13, 
                                under_exchange_segment="IDX_I")
 
-    expiry_list = response.get("data").get("data")
-
     print(response)
 
-    return expiry_list
+    return _dhan_data(response)
+
+# Public market data is cached once for every account: chains for a short window, expiries for the day.
+# allow_stale=False callers accept a chain up to CHAIN_TTL old, but never one from the stale fallback
+CHAIN_TTL = float(os.getenv("CHAIN_TTL", "30"))
+EXPIRY_LIST_TTL = float(os.getenv("EXPIRY_LIST_TTL", str(6 * 3600)))
+MARKET_CACHE = ResponseCache(ttl=CHAIN_TTL)
+
+def _market_data(key, load, ttl=None):
+    (value, age), _ = MARKET_CACHE.get(key, load, ttl=ttl)
+    if age is not None:
+        # A stale fallback is served, but not held, so the next caller retries upstream
+        MARKET_CACHE.invalidate(key)
+    return value, age
 
-def get_option_chain(expiry: str) -> dict:
+def get_expiry_list_with_age() -> tuple[list[str], float]:
+    return _market_data(
+        ("expiry_list", date.today().isoformat()),
+        lambda: resilience.call_with_stale("dhan.expiry_list", "expiry_list", _fetch_expiry_list),
+        ttl=EXPIRY_LIST_TTL,
+    )
+
+def get_expiry_list() -> list[str]:
+    return list(get_expiry_list_with_age()[0])
+
+# Dhan allows one option-chain request every 3 seconds
+DHAN_CHAIN_SPACING = 3.0
+_chain_slot_lock = threading.Lock()
+_last_chain_fetch = [0.0]
+
+def _wait_for_chain_slot():
+    # Spacing is enforced here, on real downloads only, so cache hits never sleep
+    with _chain_slot_lock:
+        wait = DHAN_CHAIN_SPACING - (time.monotonic() - _last_chain_fetch[0])
+        if wait > 0:
+            time.sleep(wait)
+        _last_chain_fetch[0] = time.monotonic()
+
+def _fetch_option_chain(expiry: str) -> OptionChain:
+    _wait_for_chain_slot()
     response = api.option_chain(under_security_id=13, 
                                 under_exchange_segment="IDX_I", 
                                 expiry=expiry)
 
     print(expiry, response)
 
-    option_chain = response.get("data").get("data")
-
-    option_chain_strikes = option_chain.get("oc")
-
-    formatted_option_chain = {
-        "last_price": option_chain.get("last_price"),
-        "chain": {}
-    }
-
-    for strike in option_chain_strikes.keys():
-        call = option_chain_strikes.get(strike).get("ce")
-        put = option_chain_strikes.get(strike).get("pe")
-        formatted_option_chain["chain"][str(strike).split(".")[0]] = {
-            "CE": {
-                "greeks": call.get("greeks"),
-                "implied_volatility": call.get("implied_volatility"),
-                "last_price": call.get("last_price"),
-                "open_interest": call.get("oi")
-            },
-            "PE": {
-                "greeks": put.get("greeks"),
-                "implied_volatility": put.get("implied_volatility"),
-                "last_price": put.get("last_price"),
-                "open_interest": put.get("oi")
-            }
-        }
-
-    return formatted_option_chain
-
-def get_option_closest_to_delta(option_chain: dict, target_delta: float, option_type: str) -> dict:
-    chain = option_chain.get("chain", {})
-    
+    option_chain = OptionChain.from_dhan(expiry, _dhan_data(response))
+
+    # Dhan occasionally omits greeks on some strikes; derive them from this chain's own smile
+    filled = iv_surface.fill_missing_greeks(option_chain)
+    if filled:
+        print(f"Filled greeks for {filled} {expiry} quotes from the IV smile")
+
+    return option_chain
+
+def get_option_chain(expiry: str, allow_stale=True) -> OptionChain:
+    # Order placement passes allow_stale=False so strikes are never picked off a stale fallback
+    fetch = lambda: _fetch_option_chain(expiry)
+    option_chain, age = _market_data(
+        ("option_chain", expiry),
+        lambda: resilience.call_with_stale("dhan.option_chain", ("option_chain", expiry), fetch,
+                                           min_delay=DHAN_CHAIN_SPACING),
+    )
+    if age is not None and not allow_stale:
+        option_chain, age = resilience.call("dhan.option_chain", fetch, min_delay=DHAN_CHAIN_SPACING), None
+        resilience.STALE.put(("option_chain", expiry), option_chain)
+    return option_chain.with_stale_age(age)
+
+# Chains older than this are too far from the market to quote greeks from
+IV_SURFACE_MAX_AGE = float(os.getenv("IV_SURFACE_MAX_AGE", "900"))
+
+def get_iv_surface() -> tuple[iv_surface.IVSurface, dict]:
+    # Built from chains already held in memory; never triggers a download.
+    # Returns the surface and the age in seconds of each expiry's source chain
+    today = date.today().isoformat()
+    chains, ages = [], {}
+    for key, chain, age in resilience.STALE.items():
+        if key[0] != "option_chain":
+            continue
+        if key[1] < today:
+            # Expired chains would clamp to the minimum time and distort interpolation, so drop them for good
+            resilience.STALE.discard(key)
+            continue
+        if age > IV_SURFACE_MAX_AGE:
+            continue
+        chains.append(chain)
+        ages[chain.expiry] = age
+    return iv_surface.IVSurface.from_chains(chains), ages
+
+def get_option_closest_to_delta(option_chain: OptionChain, target_delta: float, option_type: str) -> dict:
     best = None
     best_diff = float('inf')
     
-    for strike, options in chain.items():
-        option = options.get(option_type)
-        
-        delta = option.get("greeks").get("delta")
-        delta = float(delta)
+    for option in option_chain.side(option_type):
+        if option.delta is None:
+            continue
                 
-        diff = abs(delta - target_delta)
+        diff = abs(option.delta - target_delta)
         
         if diff < best_diff:
             best_diff = diff
             best = {
-                "strike": float(strike),
+                "strike": option.strike,
                 "option": option
             }
     
@@ -110,7 +163,12 @@ def get_option_closest_to_delta(option_chain: dict, target_delta: float, option_
 
     return best
 
+# The instrument master changes once a day, so keep one copy per trading date
+_nifty_options_cache = {"date": None, "df": None}
+
 def get_nifty_options():
+    if _nifty_options_cache["date"] == date.today():
+        return _nifty_options_cache["df"]
     url = "https://api.kite.trade/instruments"
     df = pd.read_csv(url)
     nifty_opts = df[
@@ -119,6 +177,7 @@ def get_nifty_options():
     ].copy()
     nifty_opts.sort_values(by=["expiry", "strike"], inplace=True)
     nifty_opts.reset_index(drop=True, inplace=True)
+    _nifty_options_cache.update({"date": date.today(), "df": nifty_opts})
     return nifty_opts
 
 def find_nifty_option(expiry, strike, opt_type):
@@ -132,34 +191,58 @@ def find_nifty_option(expiry, strike, opt_type):
         raise ValueError("Contract not found in instruments list")
     return match.iloc[0]["tradingsymbol"]
 
-def place_order(tradingsymbol: str, buy_or_sell: str, is_gtt=True):
-    kite = get_kite()
+# "gtt" parks entry/adjustment legs as GTTs; "chase" works them as regular limit orders repriced toward the far side
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "gtt")
+
+def place_order(tradingsymbol: str, buy_or_sell: str, is_gtt=True, kite=None, chase=False, account_id=None,
+                prices=None):
+    kite = kite or get_kite(account_id)
+    account_id = account_id or accounts.DEFAULT_ACCOUNT
     inst = f"NFO:{tradingsymbol}"
-    ltp_data = kite.ltp(inst)
-    ltp = ltp_data[inst]["last_price"]        
+    quote = pricing.QUOTES.get(kite, [inst])[inst]
+    ltp = quote["last_price"]
+    arrival = pricing.mid_price(quote)
+    transaction_type = kite.TRANSACTION_TYPE_BUY if buy_or_sell == "buy" else kite.TRANSACTION_TYPE_SELL
     if is_gtt:
-        trigger_price = ltp
-        limit_price = trigger_price + (trigger_price * 0.0026) 
-        return kite.place_gtt(
+        # Baskets pass the prices their margin check was run with
+        trigger_price, limit_price = prices or pricing.gtt_prices(quote, buy_or_sell)
+        result = kite.place_gtt(
             trigger_type=kite.GTT_TYPE_SINGLE,
             tradingsymbol=tradingsymbol,
             exchange=kite.EXCHANGE_NFO,
-            trigger_values=[limit_price],
+            trigger_values=[trigger_price],
             last_price=ltp,
             orders=[{
-                "transaction_type": kite.TRANSACTION_TYPE_BUY if buy_or_sell == "buy" else kite.TRANSACTION_TYPE_SELL,
+                "transaction_type": transaction_type,
                 "quantity": 75,
                 "order_type": kite.ORDER_TYPE_LIMIT,
                 "price": limit_price,
                 "product": kite.PRODUCT_NRML
             }]
         )
+        # Slippage on a GTT is measured against the trigger, the price at which it becomes an order
+        pricing.STATS.record(tradingsymbol, buy_or_sell, trigger_price, limit_price,
+                             gtt_id=result.get("trigger_id"), account_id=account_id)
+        return result
+    elif chase:
+        limit_price = prices[1] if prices else pricing.limit_price(quote, buy_or_sell)
+        order_id = kite.place_order(
+            variety=kite.VARIETY_REGULAR,
+            exchange=kite.EXCHANGE_NFO,
+            tradingsymbol=tradingsymbol,
+            transaction_type=transaction_type,
+            quantity=75,
+            product=kite.PRODUCT_NRML,
+            order_type=kite.ORDER_TYPE_LIMIT,
+            price=limit_price,
+        )
+        return pricing.chase_order(kite, order_id, tradingsymbol, buy_or_sell, arrival, account_id=account_id)
     else:
         return kite.place_order(
             variety=kite.VARIETY_REGULAR,
             exchange=kite.EXCHANGE_NFO,
             tradingsymbol=tradingsymbol,
-            transaction_type=kite.TRANSACTION_TYPE_BUY,
+            transaction_type=transaction_type,
             quantity=75,
             product=kite.PRODUCT_NRML,
             order_type=kite.ORDER_TYPE_MARKET,
@@ -230,11 +313,8 @@ def get_weekly_and_monthly_expiry():
 def select_entry_legs():
     weekly_expiry, monthly_expiry = get_weekly_and_monthly_expiry()
 
-    weekly_option_chain = get_option_chain(weekly_expiry)
-
-    time.sleep(2.5)
-
-    monthly_option_chain = get_option_chain(monthly_expiry)
+    weekly_option_chain = get_option_chain(weekly_expiry, allow_stale=False)
+    monthly_option_chain = get_option_chain(monthly_expiry, allow_stale=False)
 
     weekly_call = get_option_closest_to_delta(weekly_option_chain,  WEEKLY_DELTA, "CE")  # ~+0.5
     weekly_put  = get_option_closest_to_delta(weekly_option_chain, -WEEKLY_DELTA, "PE")  # ~-0.5
@@ -265,19 +345,76 @@ def map_to_tradingsymbols(legs_info):
 
     return symbols
 
-def place_entry_orders(symbols):
-    place_order(symbols["weekly_call"], "sell", is_gtt=True)
-    place_order(symbols["weekly_put"], "sell", is_gtt=True)
-    place_order(symbols["monthly_call"], "buy", is_gtt=True)
-    place_order(symbols["monthly_put"], "buy", is_gtt=True)
-
-def run_entry_logic():
+def build_legs(orders, account_id=None):
+    # orders: [(tradingsymbol, "buy" | "sell")]; one batched quote call prices every leg
+    kite = get_kite(account_id)
+    insts = [f"NFO:{ts}" for ts, _ in orders]
+    quotes = pricing.QUOTES.get(kite, insts)
+    legs = []
+    for (ts, buy_or_sell), inst in zip(orders, insts):
+        if EXECUTION_MODE == "gtt":
+            trigger, limit = pricing.gtt_prices(quotes[inst], buy_or_sell)
+        else:
+            trigger, limit = None, pricing.limit_price(quotes[inst], buy_or_sell)
+        legs.append(kite_helpers.build_leg(ts, buy_or_sell, limit, gtt_trigger=trigger))
+    return legs
+
+def place_basket(orders, account_id=None):
+    kite = get_kite(account_id)
+    is_gtt = EXECUTION_MODE == "gtt"
+    legs = build_legs(orders, account_id=account_id)
+
+    def place_leg(leg):
+        return place_order(leg["tradingsymbol"], leg["transaction_type"].lower(), is_gtt=is_gtt,
+                           kite=kite, chase=not is_gtt, account_id=account_id,
+                           prices=(leg["gtt_trigger"], leg["price"]))
+
+    return kite_helpers.execute_basket(kite, legs, place_leg, is_gtt=is_gtt)
+
+def place_entry_orders(symbols, account_id=None):
+    return place_basket([
+        (symbols["monthly_call"], "buy"),
+        (symbols["monthly_put"], "buy"),
+        (symbols["weekly_call"], "sell"),
+        (symbols["weekly_put"], "sell"),
+    ], account_id=account_id)
+
+def run_entry_logic(account_id=None):
+    return run_entry_for_accounts([account_id])[account_id]
+
+def run_entry_for_accounts(account_ids):
+    # Accounts already holding legs are skipped, so a daily schedule never stacks a second position;
+    # if positions cannot be read, entry is skipped rather than risking a duplicate
+    results = {}
+    pending = []
+    for account_id in account_ids:
+        try:
+            active_legs = get_active_legs_from_positions(account_id=account_id)
+        except Exception as e:
+            print(f"Entry skipped for {account_id}: could not read positions: {e}")
+            results[account_id] = {"ok": False, "skipped": True, "error": str(e)}
+            continue
+        if active_legs:
+            print(f"Entry skipped for {account_id}: legs already open {sorted(active_legs)}")
+            results[account_id] = {"ok": True, "skipped": True, "active_legs": sorted(active_legs)}
+            continue
+        pending.append(account_id)
+    if not pending:
+        return results
+
+    # Strikes are picked once per run and the same legs are sent to every account
     legs_info = select_entry_legs()
     symbols = map_to_tradingsymbols(legs_info)
-    place_entry_orders(symbols)
-
-def get_active_legs_from_positions(mock_positions=None):
-    kite = get_kite()
+    for account_id in pending:
+        try:
+            results[account_id] = place_entry_orders(symbols, account_id=account_id)
+        except Exception as e:
+            print(f"Entry failed for {account_id}: {e}")
+            results[account_id] = {"ok": False, "error": str(e)}
+    return results
+
+def get_active_legs_from_positions(mock_positions=None, account_id=None):
+    kite = get_kite(account_id)
     positions = kite.positions()["net"]
     if mock_positions is not None:
         positions = mock_positions["net"]
@@ -312,17 +449,22 @@ def get_active_legs_from_positions(mock_positions=None):
 
     return active_legs
 
+def get_leg_delta_with_age(expiry, strike, option_type) -> tuple[float, float]:
+    # Age is None for a fresh chain, seconds since the last good download when served stale
+    option_chain = get_option_chain(expiry)
+    quote = option_chain.get(strike, option_type)
+    if quote is None or quote.delta is None:
+        return 0.0, option_chain.stale_age
+    return quote.delta, option_chain.stale_age
+
 def get_leg_delta(expiry, strike, option_type):
-    oc = get_option_chain(expiry)
-    leg_data = oc["chain"].get(str(int(strike)), {}).get(option_type, {})
-    return float(leg_data.get("greeks", {}).get("delta", 0.0))
+    return get_leg_delta_with_age(expiry, strike, option_type)[0]
 
-def monitor_positions():
-    active_legs = get_active_legs_from_positions(mock.mock_positions)
+def monitor_positions(mock_positions=None, account_id=None):
+    active_legs = get_active_legs_from_positions(mock_positions, account_id=account_id)
 
     for leg_name, details in active_legs.items():
         print(details)
-        time.sleep(3)
         delta = get_leg_delta(details["expiry"], details["strike"], details["option_type"])
         print(f"{leg_name}: delta={delta:.2f}")
 
@@ -330,33 +472,33 @@ def monitor_positions():
         if leg_name in ["weekly_call", "weekly_put"]:
             if delta <= 0.25 or delta >= 0.75:
                 print(f"Adjusting {leg_name} at delta {delta:.2f}")
-                # adjust_weekly_leg(leg_name, details)
+                # adjust_weekly_leg(leg_name, details, account_id=account_id)
 
         # Monthly legs adjustment (trigger both if one hits)
         if leg_name in ["monthly_call", "monthly_put"] and delta >= 0.70:
             print(f"Adjusting BOTH monthly legs because {leg_name} hit delta {delta:.2f}")
-            # adjust_monthly_legs(active_legs)
+            # adjust_monthly_legs(active_legs, account_id=account_id)
             break
 
-def adjust_weekly_leg(leg_name, details):
+def adjust_weekly_leg(leg_name, details, account_id=None):
+    kite = get_kite(account_id)
     print(f"Adjusting {leg_name}: exiting {details['tradingsymbol']} and re-entering at 0.50 delta")
 
     # Exit current position
-    place_order(details["tradingsymbol"], "buy")
+    place_order(details["tradingsymbol"], "buy", kite=kite, account_id=account_id)
 
     # Determine target delta sign
     target_delta = 0.5 if details["option_type"] == "CE" else -0.5
 
     # Find new strike
-    time.sleep(2.5)
-    weekly_option = get_option_chain(details["expiry"])
+    weekly_option = get_option_chain(details["expiry"], allow_stale=False)
     new_leg = get_option_closest_to_delta(weekly_option, target_delta, details["option_type"])
     new_ts = find_nifty_option(details["expiry"], new_leg["strike"], details["option_type"])
 
     # Enter new position (SELL)
-    place_order(new_ts, "sell")
+    place_order(new_ts, "sell", kite=kite, account_id=account_id)
 
-def adjust_monthly_legs(active_legs):
+def adjust_monthly_legs(active_legs, account_id=None):
     print("Adjusting monthly legs: exiting both and re-entering at 0.30 delta")
 
     monthly_call = active_legs.get("monthly_call")
@@ -368,13 +510,8 @@ def adjust_monthly_legs(active_legs):
 
     monthly_expiry = monthly_call["expiry"]
 
-    # Exit both
-    place_order(monthly_call["tradingsymbol"], "sell")
-    place_order(monthly_put["tradingsymbol"], "sell")
-
-    # Find new strikes
-    time.sleep(2.5)
-    monthly_option = get_option_chain(monthly_expiry)
+    # Find new strikes first so exits and entries go out as one margin-checked basket
+    monthly_option = get_option_chain(monthly_expiry, allow_stale=False)
 
     call_leg = get_option_closest_to_delta(monthly_option, 0.3, "CE")
     put_leg  = get_option_closest_to_delta(monthly_option, -0.3, "PE")
@@ -382,9 +519,13 @@ def adjust_monthly_legs(active_legs):
     call_ts = find_nifty_option(monthly_expiry, call_leg["strike"], "CE")
     put_ts  = find_nifty_option(monthly_expiry, put_leg["strike"], "PE")
 
-    # Enter new positions (BUY)
-    place_order(call_ts, "buy")
-    place_order(put_ts, "buy")
+    # Enter new positions (BUY) before exiting the old ones; the old legs are only sold once the new ones are in
+    return place_basket([
+        (call_ts, "buy"),
+        (put_ts, "buy"),
+        (monthly_call["tradingsymbol"], "sell"),
+        (monthly_put["tradingsymbol"], "sell"),
+    ], account_id=account_id)
 
 def parse_option_type(symbol):
     if symbol.endswith("CE"):
@@ -393,9 +534,10 @@ def parse_option_type(symbol):
         return "PE"
     return None
 
-def get_positions():
-    kite = get_kite()
-    positions = kite.positions()["net"]
+def get_positions(account_id=None) -> list[Position]:
+    kite = get_kite(account_id)
+    # Breaker per account so one expired token does not trip positions for everyone
+    positions = resilience.call(f"kite.positions.{account_id or accounts.DEFAULT_ACCOUNT}", kite.positions)["net"]
     formatted_positions = []
 
     # Group positions by expiry to reduce API calls
@@ -408,49 +550,39 @@ def get_positions():
         # Cache option chain per expiry to avoid repeated API calls
         if expiry not in expiry_map:
             try:
-                time.sleep(2.5)
                 expiry_map[expiry] = get_option_chain(expiry)  # Dhan API call
             except Exception as e:
                 print(f"Error fetching option chain for {expiry}: {e}")
                 expiry_map[expiry] = None
 
-        # Default greeks
-        greeks = {}
+        quote = None
+        greeks_age = None
         if expiry_map[expiry]:
-            chain = expiry_map[expiry]["chain"]
-            strike_str = str(int(parsed["strike"]))
-            opt_data = chain.get(strike_str, {}).get(parsed["option_type"], {})
-            greeks = opt_data.get("greeks", {})
-
-        buy_or_sell = (
-            "BUY" if position["quantity"] > 0 
-            else "SELL" if position["quantity"] < 0 
-            else "NONE"
-        )
-
-        formatted_positions.append({
-            "tradingsymbol": position["tradingsymbol"],
-            "exchange": position["exchange"],
-            "instrument_token": position["instrument_token"],
-            "quantity": position["quantity"],
-            "average_price": position["average_price"],
-            "last_price": position["last_price"],
-            "pnl": position["pnl"],
-            "unrealised": position["unrealised"],
-            "option_type": parsed["option_type"],  
-            "buy_or_sell": buy_or_sell,
-            "expiry": parsed["expiry"],
-            "strike": parsed["strike"],
-            "stock": parsed["stock"],
-            "greeks": greeks  # Added Greeks
-        })
+            quote = expiry_map[expiry].get(parsed["strike"], parsed["option_type"])
+            greeks_age = expiry_map[expiry].stale_age  # Seconds old when served from a stale chain
+
+        formatted_positions.append(Position(
+            tradingsymbol=position["tradingsymbol"],
+            exchange=position["exchange"],
+            instrument_token=position["instrument_token"],
+            quantity=position["quantity"],
+            average_price=position["average_price"],
+            last_price=position["last_price"],
+            pnl=position["pnl"],
+            unrealised=position["unrealised"],
+            option_type=parsed["option_type"],
+            expiry=parsed["expiry"],
+            strike=parsed["strike"],
+            stock=parsed["stock"],
+            quote=quote,
+            greeks_age=greeks_age
+        ))
     
     # with open("sample.json", "w") as f:
     #     json.dump(formatted_positions, f)
 
     return formatted_positions
 
-def get_delta_for_tradingsymbol(tradingsymbol: str) -> float:
+def get_delta_for_tradingsymbol(tradingsymbol: str) -> tuple[float, float]:
     parsed = parse_kite_option_symbol(tradingsymbol)
-    time.sleep(3)
-    return get_leg_delta(parsed["expiry"], parsed["strike"], parsed["option_type"])
+    return get_leg_delta_with_age(parsed["expiry"], parsed["strike"], parsed["option_type"])
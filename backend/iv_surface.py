@@ -0,0 +1,173 @@
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from models import OptionChain
+
+IST = ZoneInfo("Asia/Kolkata")
+EXPIRY_CUTOFF = dtime(15, 30)
+SMILE_DEGREE = 4
+MIN_SMILE_POINTS = 5
+MIN_T = 1 / (365 * 24 * 4)  # 15 minutes, keeps greeks finite on expiry day
+
+
+def year_fraction(expiry: str, now: datetime = None) -> float:
+    now = now or datetime.now(IST)
+    expires_at = datetime.combine(datetime.fromisoformat(expiry).date(), EXPIRY_CUTOFF, IST)
+    return max((expires_at - now).total_seconds() / (365 * 24 * 3600), MIN_T)
+
+
+def _norm_cdf(x):
+    # Abramowitz-Stegun 7.1.26 erf approximation, vectorized (abs error < 1.5e-7)
+    z = np.abs(x) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-z * z)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+
+def _norm_pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def black76_greeks(forward, strike, t, sigma, option_type: str) -> dict:
+    # Undiscounted Black-76; vega per vol point and theta per calendar day, matching the broker's greeks
+    forward, strike, sigma = np.asarray(forward, float), np.asarray(strike, float), np.asarray(sigma, float)
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(forward / strike) + 0.5 * sigma ** 2 * t) / (sigma * sqrt_t)
+    pdf = _norm_pdf(d1)
+    delta = _norm_cdf(d1) if option_type == "CE" else _norm_cdf(d1) - 1
+    return {
+        "delta": delta,
+        "gamma": pdf / (forward * sigma * sqrt_t),
+        "theta": -forward * pdf * sigma / (2 * sqrt_t) / 365,
+        "vega": forward * pdf * sqrt_t / 100,
+    }
+
+
+class Smile:
+    __slots__ = ("expiry", "t", "forward", "coeffs", "k_min", "k_max")
+
+    def __init__(self, expiry: str, t: float, forward: float, coeffs, k_min: float, k_max: float):
+        self.expiry = expiry
+        self.t = t
+        self.forward = forward
+        self.coeffs = coeffs
+        self.k_min = k_min
+        self.k_max = k_max
+
+    def total_variance(self, strikes):
+        # Flat extrapolation in log-moneyness beyond the quoted wings
+        k = np.clip(np.log(np.asarray(strikes, float) / self.forward), self.k_min, self.k_max)
+        return np.maximum(np.polyval(self.coeffs, k), 1e-8)
+
+    def iv(self, strikes):
+        return np.sqrt(self.total_variance(strikes) / self.t)
+
+
+def _forward(chain: OptionChain) -> float:
+    # Put-call parity at the strike nearest spot; falls back to spot when LTPs are missing
+    spot = float(chain.last_price)
+    if not chain.strikes:
+        return spot
+    i = int(np.argmin(np.abs(np.asarray(chain.strikes) - spot)))
+    call, put = chain.calls[i].last_price, chain.puts[i].last_price
+    if call and put:
+        return chain.strikes[i] + call - put
+    return spot
+
+
+def fit_smile(chain: OptionChain, now: datetime = None):
+    if not chain.last_price or not chain.strikes:
+        return None
+
+    t = year_fraction(chain.expiry, now)
+    forward = _forward(chain)
+    strikes = np.asarray(chain.strikes, float)
+
+    # Out-of-the-money side only: ITM IVs are noisy and carry no extra information
+    call_iv = np.array([q.implied_volatility or np.nan for q in chain.calls], float)
+    put_iv = np.array([q.implied_volatility or np.nan for q in chain.puts], float)
+    iv = np.where(strikes >= forward, call_iv, put_iv) / 100
+
+    mask = np.isfinite(iv) & (iv > 0)
+    if mask.sum() < MIN_SMILE_POINTS:
+        return None
+
+    k = np.log(strikes[mask] / forward)
+    w = iv[mask] ** 2 * t
+    # Weight toward the money, where the strategy trades and quotes are tightest
+    weights = 1 / (1 + (k / 0.05) ** 2)
+    coeffs = np.polyfit(k, w, min(SMILE_DEGREE, mask.sum() - 1), w=np.sqrt(weights))
+    return Smile(chain.expiry, t, forward, coeffs, float(k.min()), float(k.max()))
+
+
+class IVSurface:
+    def __init__(self, smiles: list[Smile]):
+        self.smiles = sorted(smiles, key=lambda s: s.t)
+        self._by_expiry = {s.expiry: s for s in self.smiles}
+
+    @classmethod
+    def from_chains(cls, chains, now: datetime = None) -> "IVSurface":
+        smiles = [fit_smile(chain, now) for chain in chains]
+        return cls([s for s in smiles if s is not None])
+
+    def _bracket(self, t: float):
+        ts = [s.t for s in self.smiles]
+        i = int(np.searchsorted(ts, t))
+        if i == 0:
+            return self.smiles[0], self.smiles[0]
+        if i == len(ts):
+            return self.smiles[-1], self.smiles[-1]
+        return self.smiles[i - 1], self.smiles[i]
+
+    def forward_and_iv(self, strikes, expiry: str, now: datetime = None):
+        if not self.smiles:
+            raise ValueError("IV surface has no fitted expiries")
+
+        smile = self._by_expiry.get(expiry)
+        if smile is not None:
+            return smile.forward, smile.iv(strikes), smile.t
+
+        # Linear in total variance at fixed moneyness between neighbouring expiries
+        t = year_fraction(expiry, now)
+        lo, hi = self._bracket(t)
+        if lo is hi:
+            return lo.forward, np.sqrt(lo.total_variance(strikes) / lo.t), t
+        a = (t - lo.t) / (hi.t - lo.t)
+        forward = lo.forward + a * (hi.forward - lo.forward)
+        k_strikes = np.asarray(strikes, float) / forward
+        w = (1 - a) * lo.total_variance(k_strikes * lo.forward) + a * hi.total_variance(k_strikes * hi.forward)
+        return forward, np.sqrt(w / t), t
+
+    def iv(self, strikes, expiry: str, now: datetime = None):
+        return self.forward_and_iv(strikes, expiry, now)[1]
+
+    def greeks(self, strikes, expiry: str, option_type: str, now: datetime = None) -> dict:
+        forward, iv, t = self.forward_and_iv(strikes, expiry, now)
+        return {"implied_volatility": iv * 100, **black76_greeks(forward, strikes, t, iv, option_type)}
+
+
+def fill_missing_greeks(chain: OptionChain, surface: IVSurface = None) -> int:
+    # Fills quotes the broker sent without greeks in place; returns how many were filled
+    surface = surface or IVSurface.from_chains([chain])
+    if not surface.smiles:
+        return 0
+
+    filled = 0
+    for option_type in ("CE", "PE"):
+        quotes = [q for q in chain.side(option_type) if q.delta is None]
+        if not quotes:
+            continue
+        greeks = surface.greeks([q.strike for q in quotes], chain.expiry, option_type)
+        for i, quote in enumerate(quotes):
+            quote.delta = float(greeks["delta"][i])
+            quote.gamma = float(greeks["gamma"][i])
+            quote.theta = float(greeks["theta"][i])
+            quote.vega = float(greeks["vega"][i])
+            if not quote.implied_volatility:
+                quote.implied_volatility = float(greeks["implied_volatility"][i])
+        filled += len(quotes)
+
+    return filled
@@ -0,0 +1,160 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+LOT_SIZE = 75
+BASKET_MAX_WORKERS = int(os.getenv("BASKET_MAX_WORKERS", "4"))
+# A leg is a quote plus a placement, each bounded by the session's BROKER_TIMEOUT, so allow both
+BASKET_LEG_TIMEOUT = float(os.getenv("BASKET_LEG_TIMEOUT", "20"))
+
+# Fields basket_order_margins understands; legs also carry the GTT trigger for placement
+MARGIN_FIELDS = ("exchange", "tradingsymbol", "transaction_type", "variety", "product",
+                 "order_type", "quantity", "price", "trigger_price")
+
+
+class InsufficientMarginError(ValueError):
+    def __init__(self, required: float, available: float):
+        self.required = required
+        self.available = available
+        super().__init__(f"Insufficient margin: required {required:.2f}, available {available:.2f}")
+
+
+def build_leg(tradingsymbol: str, buy_or_sell: str, price: float, quantity: int = LOT_SIZE,
+              gtt_trigger: float = None) -> dict:
+    # Legs go out as LIMIT orders (directly, or as the order a GTT fires), so margin is priced the same way
+    return {
+        "exchange": "NFO",
+        "tradingsymbol": tradingsymbol,
+        "transaction_type": "BUY" if buy_or_sell == "buy" else "SELL",
+        "variety": "regular",
+        "product": "NRML",
+        "order_type": "LIMIT",
+        "quantity": quantity,
+        "price": price,
+        "trigger_price": 0,
+        "gtt_trigger": gtt_trigger,
+    }
+
+
+def check_basket_margin(kite, legs: list[dict]) -> dict:
+    # One call for the whole basket; "final" accounts for hedging benefit and open positions.
+    # GTT legs only block margin once triggered, so for them this is the margin needed at trigger time
+    orders = [{field: leg[field] for field in MARGIN_FIELDS} for leg in legs]
+    margins = kite.basket_order_margins(orders, consider_positions=True, mode="compact")
+    required = float(margins.get("final", {}).get("total", 0.0))
+    available = float(kite.margins("equity").get("net", 0.0))
+
+    if required > available:
+        raise InsufficientMarginError(required, available)
+
+    return {"required": required, "available": available}
+
+
+def _run_leg(place_fn, leg: dict) -> dict:
+    start = time.perf_counter()
+    result = place_fn(leg)
+    return {"result": result, "latency": time.perf_counter() - start}
+
+
+def _sent_ids(kite, is_gtt: bool) -> set:
+    if is_gtt:
+        return {gtt["id"] for gtt in kite.get_gtts()}
+    return {order["order_id"] for order in kite.orders()}
+
+
+def _find_sent(kite, is_gtt: bool, before: set, leg: dict):
+    # Anything new on the book for this symbol and side was sent by the timed-out leg.
+    # Returns (id, filled); a GTT counts once registered, an order only once it is COMPLETE
+    if is_gtt:
+        for gtt in kite.get_gtts():
+            orders = gtt.get("orders") or [{}]
+            if (gtt["id"] not in before
+                    and gtt.get("condition", {}).get("tradingsymbol") == leg["tradingsymbol"]
+                    and orders[0].get("transaction_type") == leg["transaction_type"]):
+                return gtt["id"], True
+    else:
+        for order in kite.orders():
+            if (order["order_id"] not in before
+                    and order.get("tradingsymbol") == leg["tradingsymbol"]
+                    and order.get("transaction_type") == leg["transaction_type"]):
+                return order["order_id"], order.get("status") == "COMPLETE"
+    return None, False
+
+
+def _leg_filled(result, is_gtt: bool) -> bool:
+    # Direct legs are chased and report their final status; anything short of COMPLETE is a failed leg
+    if is_gtt or not isinstance(result, dict):
+        return True
+    return result.get("status") == "COMPLETE"
+
+
+def _run_group(kite, legs: list[dict], place_fn, is_gtt: bool, before: set,
+               max_workers: int, leg_timeout: float) -> list[dict]:
+    results = []
+    # Waves no wider than the pool, so every leg gets the full timeout from the moment it starts
+    for i in range(0, len(legs), max_workers):
+        wave = legs[i:i + max_workers]
+        executor = ThreadPoolExecutor(max_workers=len(wave))
+        futures = [executor.submit(_run_leg, place_fn, leg) for leg in wave]
+        wait(futures, timeout=leg_timeout)
+        executor.shutdown(wait=False)
+
+        for leg, future in zip(wave, futures):
+            out = {
+                "tradingsymbol": leg["tradingsymbol"],
+                "transaction_type": leg["transaction_type"],
+            }
+            if not future.done():
+                sent_id, filled = _find_sent(kite, is_gtt, before, leg)
+                if sent_id is not None and filled:
+                    out.update({"status": "ok", "result": sent_id, "latency": None,
+                                "note": f"Confirmed on the book after the {leg_timeout}s leg timeout"})
+                elif sent_id is not None:
+                    out.update({"status": "unfilled", "result": sent_id,
+                                "error": f"Order was not filled within the {leg_timeout}s leg timeout"})
+                else:
+                    out.update({"status": "unconfirmed",
+                                "error": f"Leg did not complete within {leg_timeout}s and is not on the book yet"})
+            elif future.exception() is not None:
+                out.update({"status": "error", "error": str(future.exception())})
+            elif not _leg_filled(future.result()["result"], is_gtt):
+                status = future.result()["result"].get("status")
+                out.update({"status": "unfilled", **future.result(), "error": f"Order ended {status}"})
+            else:
+                out.update({"status": "ok", **future.result()})
+            results.append(out)
+    return results
+
+
+def execute_basket(kite, legs: list[dict], place_fn, is_gtt: bool = True, max_workers: int = BASKET_MAX_WORKERS,
+                   leg_timeout: float = BASKET_LEG_TIMEOUT, check_margin: bool = True) -> dict:
+    start = time.perf_counter()
+
+    # Abort before sending anything if the basket as a whole cannot be funded
+    margin = check_basket_margin(kite, legs) if check_margin else None
+    before = _sent_ids(kite, is_gtt)
+
+    # Hedges first: no SELL is sent unless every BUY succeeded. Direct (chased) BUYs must have
+    # filled, so a failure cannot leave a naked short. GTT BUYs only have to be registered; they
+    # trigger independently of the SELLs, so GTT mode orders the legs but does not guarantee the hedge
+    results = []
+    for side in ("BUY", "SELL"):
+        group = [leg for leg in legs if leg["transaction_type"] == side]
+        if any(r["status"] != "ok" for r in results):
+            results += [{"tradingsymbol": leg["tradingsymbol"], "transaction_type": side, "status": "skipped",
+                         "error": "Not sent because an earlier hedge leg failed"} for leg in group]
+            continue
+        results += _run_group(kite, group, place_fn, is_gtt, before, max_workers, leg_timeout)
+
+    latency = time.perf_counter() - start
+    failed = [r["tradingsymbol"] for r in results if r["status"] != "ok"]
+    print(f"Basket of {len(legs)} legs finished in {latency:.3f}s ({len(failed)} failed)")
+    if failed:
+        print(f"Failed legs: {failed}")
+
+    return {
+        "legs": results,
+        "margin": margin,
+        "latency": latency,
+        "ok": not failed,
+    }
@@ -1,11 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from datetime import datetime, timezone
 import helper
+import accounts
+import models
+import pricing
+import resilience
+from response_cache import CACHE
 import mock
 import os
 import requests
 import json
+import hmac
+import math
+from urllib.parse import urlencode
 import dotenv
 dotenv.load_dotenv()
 
@@ -13,15 +21,42 @@ app = Flask(__name__)
 
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "https://zerodha-automated-trading.vercel.app"]}})
 
-KITE_API_KEY = os.getenv("KITE_API_KEY")
-KITE_API_SECRET = os.getenv("KITE_API_SECRET")
 KITE_REDIRECT_URL = os.getenv("KITE_REDIRECT_URL")  # Add this to your .env
+scheduler_stats_file = os.getenv("SCHEDULER_STATS_FILE", "scheduler_stats.json")  # Written by scheduler.py
+scheduler_token = os.getenv("SCHEDULER_TOKEN")  # Shared with scheduler.py for pushing stats
+scheduler_stats = {"latest": None}
+
+class Unauthorized(Exception):
+    pass
+
+def request_account():
+    # Accounts are picked per request and must present that account's API token as a bearer token;
+    # without an account id, the single-account default is used
+    account_id = request.headers.get("X-Account-Id") or request.args.get("account")
+    account = accounts.REGISTRY.get(account_id)
+    auth = request.headers.get("Authorization", "")
+    token = auth[len("Bearer "):] if auth.startswith("Bearer ") else None
+    if not account.authorize(token):
+        raise Unauthorized(f"Missing or invalid API token for account {account.id}")
+    return account
+
+def account_error(e: Exception):
+    if isinstance(e, KeyError):
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"error": str(e)}), 401
 
 @app.route("/login")
 def kite_login():
     try:
-        kite = helper.get_kite()
-        login_url = kite.login_url()
+        account = request_account()
+    except (KeyError, Unauthorized) as e:
+        return account_error(e)
+    try:
+        login_url = account.login_client().login_url()
+        if account.requires_auth:
+            # Kite echoes redirect_params back on the callback; the signed state ties it to this login
+            params = urlencode({"account": account.id, "state": account.login_state()})
+            login_url += "&" + urlencode({"redirect_params": params})
         return jsonify({"login_url": login_url})
     except Exception as e:
         return jsonify({"error": f"Kite API key not configured or error: {e}"}), 500
@@ -35,13 +70,16 @@ def kite_callback():
     if not request_token:
         return "Missing request_token", 400
     try:
-        from kiteconnect import KiteConnect
-        kite = KiteConnect(api_key=KITE_API_KEY)
-        data = kite.generate_session(request_token, api_secret=KITE_API_SECRET)
+        account = accounts.REGISTRY.get(request.args.get("account"))
+    except KeyError as e:
+        return str(e), 404
+    if account.requires_auth and not account.verify_login_state(request.args.get("state")):
+        return "Invalid or expired login state", 401
+    try:
+        kite = account.login_client()
+        data = kite.generate_session(request_token, api_secret=account.api_secret)
         access_token = data["access_token"]
-        with open("kite_token.json", "w") as f:
-            json.dump({"access_token": access_token, "generated_at": datetime.now().isoformat()}, f)
-        kite.set_access_token(access_token)
+        account.save_token(access_token, datetime.now().isoformat())
         # Always redirect to the URL from .env if set
         if KITE_REDIRECT_URL:
             from flask import redirect
@@ -66,27 +104,112 @@ def add_cors(resp):
     else:
         resp.headers["Access-Control-Allow-Origin"] = "http://localhost:3000"
     resp.headers["Access-Control-Allow-Methods"] = "GET,POST,OPTIONS"
-    resp.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization"
-    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization,X-Account-Id"
+    # Cached endpoints set their own policy; everything else stays uncached
+    if "Cache-Control" not in resp.headers:
+        resp.headers["Cache-Control"] = "no-cache"
     return resp
 
 @app.get("/expiry_list")
 def expiry_list():
     try:
-        expiries = helper.get_expiry_list()
-        return jsonify({"expiries": expiries})
+        expiries, age = helper.get_expiry_list_with_age()
+        return jsonify({"expiries": expiries, "stale_age": age})
     except Exception as e:
         return jsonify({"error": f"Failed to fetch expiry list: {e}", "expiries": []}), 500
 
 @app.get("/positions")
 def positions():
     try:
-        print("calling")
-        positions = helper.get_positions()
-        return jsonify({"positions": positions})
+        account = request_account()
+    except (KeyError, Unauthorized) as e:
+        return account_error(e)
+    try:
+        # Cache the serialized body so repeat hits skip both the broker and the encoder
+        body, etag = account.cache.get("positions", lambda: models.dumps({"positions": helper.get_positions(account.id)}))
     except Exception as e:
         return jsonify({"error": f"Failed to fetch positions: {e}", "positions": []}), 500
 
+    # make_etag returns the quoted header value; werkzeug's ETags hold unquoted tags
+    if request.if_none_match.contains_weak(etag.strip('"')):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype="application/json")
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = f"private, max-age={int(account.cache.ttl)}"
+    resp.headers["Vary"] = "X-Account-Id"
+    return resp
+
+def cached_delta(symbol: str) -> tuple[float, float]:
+    # Returns (delta, stale_age); stale_age is None unless the chain came from the stale fallback
+    value, _ = CACHE.get(("delta", symbol), lambda: helper.get_delta_for_tradingsymbol(symbol))
+    return value
+
+@app.get("/health")
+def health():
+    # Stats pushed by the worker win; the file only exists when both processes share a disk
+    scheduler = scheduler_stats["latest"]
+    if scheduler is None and os.path.exists(scheduler_stats_file):
+        try:
+            with open(scheduler_stats_file) as f:
+                scheduler = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            scheduler = {"error": f"Could not read scheduler stats: {e}"}
+    return jsonify({"breakers": resilience.breaker_states(), "scheduler": scheduler})
+
+@app.post("/scheduler_stats")
+def publish_scheduler_stats():
+    token = request.headers.get("X-Scheduler-Token", "")
+    if not scheduler_token or not hmac.compare_digest(scheduler_token, token):
+        return jsonify({"error": "Invalid scheduler token"}), 401
+    scheduler_stats["latest"] = request.get_json(silent=True)
+    return jsonify({"ok": True})
+
+@app.get("/greeks")
+def greeks():
+    expiry = request.args.get("expiry")
+    option_type = request.args.get("option_type")
+    strikes = request.args.get("strikes", "")
+
+    if not expiry or option_type not in ("CE", "PE") or not strikes:
+        return jsonify({"error": "expiry, option_type (CE|PE) and strikes required"}), 400
+
+    try:
+        strikes = [float(s) for s in strikes.split(",")]
+        datetime.strptime(expiry, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "strikes must be numbers and expiry must be YYYY-MM-DD"}), 400
+    # Non-positive or non-finite strikes make log-moneyness NaN, which is not valid JSON
+    if not all(math.isfinite(s) and s > 0 for s in strikes):
+        return jsonify({"error": "strikes must be positive"}), 400
+
+    surface, chain_ages = helper.get_iv_surface()
+    if not surface.smiles:
+        return jsonify({"error": "No recent option chains cached to fit an IV surface"}), 503
+    result = surface.greeks(strikes, expiry, option_type)
+
+    return jsonify({
+        "expiry": expiry,
+        "option_type": option_type,
+        "strikes": strikes,
+        # Seconds since each source chain was fetched; stale_age is the oldest one used
+        "chain_ages": {smile.expiry: round(chain_ages[smile.expiry], 1) for smile in surface.smiles},
+        "stale_age": round(max(chain_ages[smile.expiry] for smile in surface.smiles), 1),
+        **{name: values.tolist() for name, values in result.items()},
+    })
+
+@app.get("/execution_stats")
+def execution_stats():
+    try:
+        account = request_account()
+    except (KeyError, Unauthorized) as e:
+        return account_error(e)
+    try:
+        pricing.reconcile_gtts(account.kite(), account.id)
+    except Exception as e:
+        print(f"Failed to reconcile GTTs for {account.id}: {e}")
+    return jsonify(pricing.STATS.summary(account.id))
+
 @app.post("/send_telegram")
 def send_telegram():
     body = request.get_json(silent=True) or {}
@@ -115,42 +238,54 @@ def check_net_delta():
     if not selected_symbols or not target_delta or condition_type not in ("above", "below"):
         return jsonify({"error": "selected_symbols, target_delta, and condition_type required"}), 400
 
-    try:
+    # Tabs polling the same selection share one computation and one alert per TTL window
+    key = ("check_net_delta", tuple(sorted(set(selected_symbols))), str(target_delta),
+           condition_type, telegram_chat_id)
+
+    def compute():
         # Get live delta for each selected position
         net_delta = 0.0
         position_deltas = []
-        
-        for symbol in selected_symbols:
+        stale_age = None
+
+        for symbol in sorted(set(selected_symbols)):
             try:
-                delta = float(helper.get_delta_for_tradingsymbol(symbol))
+                delta, age = cached_delta(symbol)
                 net_delta += delta
-                position_deltas.append({"symbol": symbol, "delta": delta})
+                position_deltas.append({"symbol": symbol, "delta": delta, "stale_age": age})
+                if age is not None:
+                    stale_age = max(stale_age or 0.0, age)
             except Exception as e:
                 print(f"Failed to get delta for {symbol}: {e}")
                 # Continue with other symbols
-                
+
         target = float(target_delta)
         triggered = (net_delta > target) if condition_type == "above" else (net_delta < target)
 
-        if triggered:
+        # Never alert off a chain served from the stale fallback
+        if triggered and stale_age is None:
             msg = f"🚨 Net Delta Alert!\n\n"
             msg += f"Net delta has gone {condition_type} your target of {target:.3f}\n"
             msg += f"Current net delta: {net_delta:.3f}\n\n"
             msg += "Selected positions:\n"
             for pos in position_deltas:
                 msg += f"• {pos['symbol']}: Δ={pos['delta']:.3f}\n"
-                
+
             notify(msg, telegram_bot_token, telegram_chat_id)
 
-        return jsonify({
+        return {
             "net_delta": net_delta,
             "target_delta": target,
             "condition_type": condition_type,
             "triggered": triggered,
             "position_deltas": position_deltas,
+            "stale_age": stale_age,
             "checked_at": datetime.now(timezone.utc).isoformat(),
-        })
-        
+        }
+
+    try:
+        result, _ = CACHE.get(key, compute)
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": f"Failed to check net delta: {e}"}), 500
 
@@ -168,30 +303,39 @@ def check_delta():
         return jsonify({"error": "tradingsymbol, conditionType, conditionValue required"}), 400
 
     try:
-        delta = float(helper.get_delta_for_tradingsymbol(ts))
+        delta, stale_age = cached_delta(ts)
     except Exception as e:
         return jsonify({"error": f"Failed to fetch delta for {ts}: {e}"}), 502
 
-    threshold = float(cval)
-    triggered = (delta > threshold) if ctype == "above" else (delta < threshold)
+    def compute():
+        threshold = float(cval)
+        triggered = (delta > threshold) if ctype == "above" else (delta < threshold)
 
-    msg = (
-        f"{body['buy_or_sell']} {body['stock']} "
-        f"{body['strike']} {body['option_type']} {body['expiry']}\n\n{body['tradingsymbol']}"
-        f" has went {ctype} your target delta of {cval}. \n\nIt has a delta of {delta} currently."
-    )
+        msg = (
+            f"{body['buy_or_sell']} {body['stock']} "
+            f"{body['strike']} {body['option_type']} {body['expiry']}\n\n{body['tradingsymbol']}"
+            f" has went {ctype} your target delta of {cval}. \n\nIt has a delta of {delta} currently."
+        )
 
-    if triggered:
-        notify(msg, telegram_bot_token, telegram_chat_id)
+        # Never alert off a chain served from the stale fallback
+        if triggered and stale_age is None:
+            notify(msg, telegram_bot_token, telegram_chat_id)
 
-    return jsonify({
-        "tradingsymbol": ts,
-        "delta": delta,
-        "condition_type": ctype,
-        "condition_value": threshold,
-        "triggered": triggered,
-        "checked_at": datetime.now(timezone.utc).isoformat(),
-    })
+        return {
+            "tradingsymbol": ts,
+            "delta": delta,
+            "condition_type": ctype,
+            "condition_value": threshold,
+            "triggered": triggered,
+            "stale_age": stale_age,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    try:
+        result, _ = CACHE.get(("check_delta", ts, ctype, str(cval), telegram_chat_id), compute)
+    except Exception as e:
+        return jsonify({"error": f"Failed to check delta for {ts}: {e}"}), 500
+    return jsonify(result)
 
 def notify(text: str, bot_token=None, chat_id=None):
     # Use provided token/chat_id, else fallback to env
@@ -0,0 +1,181 @@
+import json
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder when orjson is not installed
+    orjson = None
+
+
+class OptionQuote:
+    __slots__ = ("strike", "option_type", "last_price", "implied_volatility", "open_interest",
+                 "delta", "gamma", "theta", "vega")
+
+    def __init__(self, strike: int, option_type: str, last_price=None, implied_volatility=None,
+                 open_interest=None, delta=None, gamma=None, theta=None, vega=None):
+        self.strike = strike
+        self.option_type = option_type
+        self.last_price = last_price
+        self.implied_volatility = implied_volatility
+        self.open_interest = open_interest
+        self.delta = delta
+        self.gamma = gamma
+        self.theta = theta
+        self.vega = vega
+
+    @classmethod
+    def from_dhan(cls, strike: int, option_type: str, data: dict) -> "OptionQuote":
+        greeks = data.get("greeks") or {}
+        return cls(
+            strike,
+            option_type,
+            last_price=data.get("last_price"),
+            implied_volatility=data.get("implied_volatility"),
+            open_interest=data.get("oi"),
+            delta=_float_or_none(greeks.get("delta")),
+            gamma=_float_or_none(greeks.get("gamma")),
+            theta=_float_or_none(greeks.get("theta")),
+            vega=_float_or_none(greeks.get("vega")),
+        )
+
+    @property
+    def greeks(self) -> dict:
+        if self.delta is None:
+            return {}
+        return {"delta": self.delta, "theta": self.theta, "gamma": self.gamma, "vega": self.vega}
+
+    def to_dict(self) -> dict:
+        return {
+            "greeks": self.greeks,
+            "implied_volatility": self.implied_volatility,
+            "last_price": self.last_price,
+            "open_interest": self.open_interest,
+        }
+
+
+class OptionChain:
+    __slots__ = ("expiry", "last_price", "strikes", "calls", "puts", "_index", "stale_age")
+
+    def __init__(self, expiry: str, last_price: float, strikes: list[int],
+                 calls: list[OptionQuote], puts: list[OptionQuote], stale_age: float = None):
+        # Parallel arrays sorted by strike; _index maps strike -> position for O(1) lookup
+        self.expiry = expiry
+        self.last_price = last_price
+        self.strikes = strikes
+        self.calls = calls
+        self.puts = puts
+        self._index = {strike: i for i, strike in enumerate(strikes)}
+        self.stale_age = stale_age
+
+    @classmethod
+    def from_dhan(cls, expiry: str, data: dict) -> "OptionChain":
+        rows = sorted((int(float(strike)), legs) for strike, legs in (data.get("oc") or {}).items())
+        return cls(
+            expiry,
+            data.get("last_price"),
+            [strike for strike, _ in rows],
+            [OptionQuote.from_dhan(strike, "CE", legs.get("ce") or {}) for strike, legs in rows],
+            [OptionQuote.from_dhan(strike, "PE", legs.get("pe") or {}) for strike, legs in rows],
+        )
+
+    def with_stale_age(self, age: float) -> "OptionChain":
+        # Shares the quote arrays; only the age differs between callers
+        chain = OptionChain.__new__(OptionChain)
+        for slot in OptionChain.__slots__:
+            setattr(chain, slot, getattr(self, slot))
+        chain.stale_age = age
+        return chain
+
+    def side(self, option_type: str) -> list[OptionQuote]:
+        return self.calls if option_type == "CE" else self.puts
+
+    def get(self, strike, option_type: str):
+        i = self._index.get(int(strike))
+        return None if i is None else self.side(option_type)[i]
+
+    def __contains__(self, strike) -> bool:
+        return int(strike) in self._index
+
+    def to_dict(self) -> dict:
+        return {
+            "expiry": self.expiry,
+            "last_price": self.last_price,
+            "stale_age": self.stale_age,
+            "chain": {
+                str(strike): {"CE": call.to_dict(), "PE": put.to_dict()}
+                for strike, call, put in zip(self.strikes, self.calls, self.puts)
+            },
+        }
+
+
+class Position:
+    __slots__ = ("tradingsymbol", "exchange", "instrument_token", "quantity", "average_price",
+                 "last_price", "pnl", "unrealised", "option_type", "expiry", "strike", "stock",
+                 "quote", "greeks_age")
+
+    def __init__(self, tradingsymbol: str, exchange: str, instrument_token: int, quantity: int,
+                 average_price: float, last_price: float, pnl: float, unrealised: float,
+                 option_type: str, expiry: str, strike: int, stock: str,
+                 quote: OptionQuote = None, greeks_age: float = None):
+        self.tradingsymbol = tradingsymbol
+        self.exchange = exchange
+        self.instrument_token = instrument_token
+        self.quantity = quantity
+        self.average_price = average_price
+        self.last_price = last_price
+        self.pnl = pnl
+        self.unrealised = unrealised
+        self.option_type = option_type
+        self.expiry = expiry
+        self.strike = strike
+        self.stock = stock
+        self.quote = quote
+        self.greeks_age = greeks_age
+
+    @property
+    def buy_or_sell(self) -> str:
+        return "BUY" if self.quantity > 0 else "SELL" if self.quantity < 0 else "NONE"
+
+    @property
+    def greeks(self) -> dict:
+        return self.quote.greeks if self.quote else {}
+
+    def to_dict(self) -> dict:
+        return {
+            "tradingsymbol": self.tradingsymbol,
+            "exchange": self.exchange,
+            "instrument_token": self.instrument_token,
+            "quantity": self.quantity,
+            "average_price": self.average_price,
+            "last_price": self.last_price,
+            "pnl": self.pnl,
+            "unrealised": self.unrealised,
+            "option_type": self.option_type,
+            "buy_or_sell": self.buy_or_sell,
+            "expiry": self.expiry,
+            "strike": self.strike,
+            "stock": self.stock,
+            "greeks": self.greeks,
+            "greeks_age": self.greeks_age,
+        }
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _default(obj):
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
@@ -0,0 +1,281 @@
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+NFO_TICK_SIZE = 0.05
+QUOTE_TTL = float(os.getenv("QUOTE_TTL", "1.0"))
+
+# Fallback when the book is empty: the old fixed markup, applied side-aware
+FALLBACK_MARKUP = 0.0026
+# Kite rejects GTT triggers within ~0.25% of LTP
+GTT_TRIGGER_OFFSET = 0.0026
+
+# Where inside the spread to price: 0 = join our side, 0.5 = mid, 1 = cross the spread
+DEFAULT_AGGRESSION = float(os.getenv("PRICING_AGGRESSION", "0.5"))
+CHASE_STEPS = int(os.getenv("CHASE_STEPS", "3"))
+CHASE_INTERVAL = float(os.getenv("CHASE_INTERVAL", "2.0"))
+
+
+def round_to_tick(price: float, tick_size: float = NFO_TICK_SIZE) -> float:
+    ticks = (Decimal(str(price)) / Decimal(str(tick_size))).quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+    return float(ticks * Decimal(str(tick_size)))
+
+
+class QuoteCache:
+    def __init__(self, ttl: float = QUOTE_TTL):
+        self.ttl = ttl
+        self._quotes = {}
+        self._lock = threading.Lock()
+
+    def get(self, kite, instruments: list[str], max_age: float = None) -> dict:
+        max_age = self.ttl if max_age is None else max_age
+        now = time.monotonic()
+        out = {}
+        missing = []
+
+        with self._lock:
+            for inst in instruments:
+                cached = self._quotes.get(inst)
+                if cached and now - cached[0] <= max_age:
+                    out[inst] = cached[1]
+                else:
+                    missing.append(inst)
+
+        # One batched quote call for everything not fresh enough
+        if missing:
+            fetched = kite.quote(missing)
+            with self._lock:
+                for inst, quote in fetched.items():
+                    self._quotes[inst] = (time.monotonic(), quote)
+            out.update(fetched)
+
+        return out
+
+
+QUOTES = QuoteCache()
+
+
+def best_bid_ask(quote: dict):
+    depth = quote.get("depth") or {}
+    bids = [lvl["price"] for lvl in depth.get("buy", []) if lvl.get("price") and lvl.get("quantity")]
+    asks = [lvl["price"] for lvl in depth.get("sell", []) if lvl.get("price") and lvl.get("quantity")]
+    return (max(bids) if bids else None), (min(asks) if asks else None)
+
+
+def limit_price(quote: dict, buy_or_sell: str, aggression: float = DEFAULT_AGGRESSION,
+                tick_size: float = NFO_TICK_SIZE) -> float:
+    bid, ask = best_bid_ask(quote)
+    ltp = quote.get("last_price")
+
+    if bid is None or ask is None or ask < bid:
+        if not ltp:
+            raise ValueError("No depth or last price available to price order")
+        markup = FALLBACK_MARKUP if buy_or_sell == "buy" else -FALLBACK_MARKUP
+        return round_to_tick(ltp * (1 + markup), tick_size)
+
+    aggression = min(max(aggression, 0.0), 1.0)
+    spread = ask - bid
+    if buy_or_sell == "buy":
+        price = bid + spread * aggression
+    else:
+        price = ask - spread * aggression
+
+    return min(max(round_to_tick(price, tick_size), bid), ask)
+
+
+def gtt_prices(quote: dict, buy_or_sell: str, tick_size: float = NFO_TICK_SIZE) -> tuple[float, float]:
+    # The limit is priced off the trigger, not today's book: by the time the GTT fires the book
+    # has moved to the trigger, so the limit sits one spread through it to stay marketable
+    ltp = quote["last_price"]
+    trigger = round_to_tick(ltp * (1 + GTT_TRIGGER_OFFSET), tick_size)
+    bid, ask = best_bid_ask(quote)
+    spread = max(ask - bid, tick_size) if bid is not None and ask is not None and ask >= bid else tick_size
+    if buy_or_sell == "buy":
+        limit = trigger + spread
+    else:
+        limit = max(trigger - spread, tick_size)
+    return trigger, round_to_tick(limit, tick_size)
+
+
+def mid_price(quote: dict):
+    bid, ask = best_bid_ask(quote)
+    if bid is None or ask is None:
+        return quote.get("last_price")
+    return (bid + ask) / 2
+
+
+class ExecutionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pending = {}
+        # Counters are kept per account so one account's summary never includes another's trading
+        self.accounts = {}
+
+    def _counters(self, account_id) -> dict:
+        # Caller holds the lock
+        if account_id not in self.accounts:
+            self.accounts[account_id] = {"orders": 0, "resolved": 0, "filled": 0, "reprices": 0,
+                                         "slippage": 0.0, "recent": []}
+        return self.accounts[account_id]
+
+    def record(self, tradingsymbol: str, buy_or_sell: str, arrival: float, limit: float,
+               fill: float = None, reprices: int = 0, status: str = "PLACED", gtt_id=None, account_id=None):
+        # Slippage is signed so that a positive number is always a cost versus arrival mid
+        slippage = None
+        if fill is not None and arrival:
+            slippage = (fill - arrival) if buy_or_sell == "buy" else (arrival - fill)
+
+        with self._lock:
+            counters = self._counters(account_id)
+            counters["orders"] += 1
+            counters["reprices"] += reprices
+            if status != "PLACED":
+                counters["resolved"] += 1
+            if fill is not None:
+                counters["filled"] += 1
+                counters["slippage"] += slippage or 0.0
+            entry = {
+                "tradingsymbol": tradingsymbol,
+                "buy_or_sell": buy_or_sell,
+                "arrival": arrival,
+                "limit": limit,
+                "fill": fill,
+                "slippage": slippage,
+                "reprices": reprices,
+                "status": status,
+                "account_id": account_id,
+            }
+            if gtt_id is not None:
+                # Resolved later by reconcile_gtts once the GTT triggers, expires or is deleted
+                self.pending[gtt_id] = entry
+            counters["recent"].append(entry)
+            counters["recent"] = counters["recent"][-50:]
+
+    def resolve(self, gtt_id, status: str, fill: float = None):
+        with self._lock:
+            entry = self.pending.pop(gtt_id, None)
+            if entry is None:
+                return
+            counters = self._counters(entry["account_id"])
+            entry["status"] = status
+            counters["resolved"] += 1
+            if fill is not None:
+                entry["fill"] = fill
+                if entry["arrival"]:
+                    entry["slippage"] = (fill - entry["arrival"]) if entry["buy_or_sell"] == "buy" else (entry["arrival"] - fill)
+                    counters["slippage"] += entry["slippage"]
+                counters["filled"] += 1
+
+    def pending_for(self, account_id) -> list:
+        with self._lock:
+            return [gtt_id for gtt_id, entry in self.pending.items() if entry["account_id"] == account_id]
+
+    def summary(self, account_id=None) -> dict:
+        with self._lock:
+            counters = self._counters(account_id)
+            filled, resolved = counters["filled"], counters["resolved"]
+            return {
+                "orders": counters["orders"],
+                "pending": sum(1 for entry in self.pending.values() if entry["account_id"] == account_id),
+                "filled": filled,
+                # Market orders are not tracked; GTTs count once reconciled, chased orders once done
+                "fill_rate": filled / resolved if resolved else None,
+                "reprices": counters["reprices"],
+                "avg_slippage": counters["slippage"] / filled if filled else None,
+                "recent": list(counters["recent"]),
+            }
+
+
+STATS = ExecutionStats()
+
+
+def _last_status(kite, order_id) -> dict:
+    history = kite.order_history(order_id)
+    return history[-1] if history else {}
+
+
+def _fill_price(kite, order_id):
+    status = _last_status(kite, order_id)
+    return status.get("average_price") if status.get("status") == "COMPLETE" else None
+
+
+def _filled_despite(kite, order_id, error: Exception) -> dict:
+    # modify/cancel fail on an order that has just filled; that is a fill, not an error
+    status = _last_status(kite, order_id)
+    if status.get("status") != "COMPLETE":
+        raise error
+    return status
+
+
+def reconcile_gtts(kite, account_id=None) -> int:
+    # Settles GTTs placed by this process: triggered ones are looked up for their fill
+    resolved = 0
+    for gtt_id in STATS.pending_for(account_id):
+        gtt = kite.get_gtt(gtt_id)
+        status = gtt.get("status")
+        if status == "active":
+            continue
+        fill = None
+        if status == "triggered":
+            for order in gtt.get("orders", []):
+                order_id = ((order.get("result") or {}).get("order_result") or {}).get("order_id")
+                if order_id:
+                    fill = _fill_price(kite, order_id)
+        STATS.resolve(gtt_id, "COMPLETE" if fill is not None else status.upper(), fill=fill)
+        resolved += 1
+    return resolved
+
+
+def chase_order(kite, order_id, tradingsymbol: str, buy_or_sell: str, arrival: float,
+                aggression: float = DEFAULT_AGGRESSION, steps: int = CHASE_STEPS,
+                interval: float = CHASE_INTERVAL, cancel_unfilled: bool = True, account_id=None) -> dict:
+    inst = f"NFO:{tradingsymbol}"
+    step_size = (1.0 - aggression) / steps if steps else 0.0
+    price = None
+    reprices = 0
+
+    def complete(status):
+        fill = status.get("average_price")
+        STATS.record(tradingsymbol, buy_or_sell, arrival, price or status.get("price"),
+                     fill=fill, reprices=reprices, status="COMPLETE", account_id=account_id)
+        return {"order_id": order_id, "status": "COMPLETE", "fill": fill, "reprices": reprices}
+
+    for step in range(steps + 1):
+        time.sleep(interval)
+        status = _last_status(kite, order_id)
+
+        if status.get("status") == "COMPLETE":
+            return complete(status)
+
+        if status.get("status") in ("CANCELLED", "REJECTED") or step == steps:
+            break
+
+        # Walk toward the far side of the book, modifying the working order rather than cancel-and-replace
+        quote = QUOTES.get(kite, [inst], max_age=0)[inst]
+        new_price = limit_price(quote, buy_or_sell, aggression + step_size * (step + 1))
+        if new_price != status.get("price"):
+            try:
+                kite.modify_order(variety=kite.VARIETY_REGULAR, order_id=order_id, price=new_price)
+            except Exception as e:
+                return complete(_filled_despite(kite, order_id, e))
+            price = new_price
+            reprices += 1
+
+    final = status.get("status", "UNKNOWN")
+    if final not in ("CANCELLED", "REJECTED"):
+        # Never leave a chased order resting silently: cancel it, or say plainly that it is still live
+        if cancel_unfilled:
+            try:
+                kite.cancel_order(variety=kite.VARIETY_REGULAR, order_id=order_id)
+            except Exception as e:
+                return complete(_filled_despite(kite, order_id, e))
+            final = "CANCELLED_UNFILLED"
+        else:
+            final = "LEFT_WORKING"
+    STATS.record(tradingsymbol, buy_or_sell, arrival, price or status.get("price"),
+                 reprices=reprices, status=final, account_id=account_id)
+    return {"order_id": order_id, "status": final, "fill": None, "reprices": reprices}
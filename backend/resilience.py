@@ -0,0 +1,162 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from kiteconnect.exceptions import InputException, PermissionException, TokenException
+
+BROKER_TIMEOUT = float(os.getenv("BROKER_TIMEOUT", "8"))
+BROKER_RETRIES = int(os.getenv("BROKER_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "4"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# The broker answered and refused the request: retrying cannot help and it says nothing about broker health
+NON_RETRYABLE = (TokenException, InputException, PermissionException)
+
+
+class BrokerError(Exception):
+    pass
+
+
+class CircuitOpenError(BrokerError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state != "half_open":
+                return self.state == "closed"
+            # Let exactly one probe through; re-arm the timer for everyone else
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"Circuit {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_states() -> dict:
+    with _breakers_lock:
+        return {name: {"state": b.state, "failures": b.failures} for name, b in _breakers.items()}
+
+
+# Calls run on a pool we can stop waiting on; clients also get an HTTP timeout of BROKER_TIMEOUT
+# so an abandoned attempt frees its worker instead of blocking retries queued behind it
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("BROKER_POOL_SIZE", "8")))
+
+
+def call(endpoint: str, fn, timeout: float = BROKER_TIMEOUT, retries: int = BROKER_RETRIES, min_delay: float = 0.0):
+    # min_delay keeps retries outside an endpoint's rate-limit window; jitter is added on top
+    breaker = get_breaker(endpoint)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit open for {endpoint}")
+
+    last_error = None
+    for attempt in range(retries + 1):
+        try:
+            result = _executor.submit(fn).result(timeout=timeout)
+            breaker.record_success()
+            return result
+        except NON_RETRYABLE:
+            # A healthy reply, so an expired token or bad input never trips (or holds open) the breaker
+            breaker.record_success()
+            raise
+        except FutureTimeout:
+            last_error = BrokerError(f"{endpoint} timed out after {timeout}s")
+        except Exception as e:
+            last_error = e
+
+        print(f"{endpoint} attempt {attempt + 1} failed: {last_error}")
+
+        if attempt < retries:
+            # Full jitter keeps retries from several requests from landing together
+            time.sleep(min_delay + random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+    # One failed call is one breaker failure, however many attempts it took
+    breaker.record_failure()
+    raise last_error
+
+
+class StaleCache:
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = (time.time(), value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+        if entry is None:
+            return None, None
+        return entry[1], time.time() - entry[0]
+
+    def items(self) -> list:
+        # (key, value, age) for everything held
+        now = time.time()
+        with self._lock:
+            return [(key, entry[1], now - entry[0]) for key, entry in self._values.items()]
+
+    def discard(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+
+STALE = StaleCache()
+
+
+def call_with_stale(endpoint: str, key, fn, **kwargs):
+    # Returns (value, age): age is None for a fresh value, seconds since last success otherwise
+    try:
+        value = call(endpoint, fn, **kwargs)
+    except Exception as e:
+        value, age = STALE.get(key)
+        if value is None:
+            raise
+        print(f"Serving stale {key} ({age:.0f}s old): {e}")
+        return value, age
+
+    STALE.put(key, value)
+    return value, None
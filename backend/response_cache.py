@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "5"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# Longest a follower waits on the leader before giving up
+RESPONSE_CACHE_WAIT = float(os.getenv("RESPONSE_CACHE_WAIT", "60"))
+
+
+def make_etag(value) -> str:
+    # Pre-serialized bodies are hashed as-is so the tag matches the bytes on the wire
+    body = value if isinstance(value, bytes) else json.dumps(value, sort_keys=True, default=str).encode()
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 wait_timeout: float = RESPONSE_CACHE_WAIT):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        # Keys include client-supplied values, so the cache is a bounded LRU
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+
+        # Followers wait on the leader instead of hitting the broker again
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                raise TimeoutError(f"Timed out after {self.wait_timeout}s waiting for in-flight {key}")
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            value = compute()
+            etag = make_etag(value)
+            call.value = (value, etag)
+            with self._lock:
+                self._entries[key] = (time.monotonic() + ttl, value, etag)
+                self._entries.move_to_end(key)
+                self._prune()
+            return call.value
+        except Exception as e:
+            # Errors are shared with concurrent waiters but never cached
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def _prune(self):
+        # Caller holds the lock; drop expired entries, then the least recently used over the cap
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+CACHE = ResponseCache()
@@ -0,0 +1,191 @@
+import json
+import os
+import tempfile
+import time
+import traceback
+from datetime import date, datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
+
+import dotenv
+import requests
+dotenv.load_dotenv()
+
+import accounts
+import helper
+
+IST = ZoneInfo("Asia/Kolkata")
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+
+# NSE equity/F&O trading holidays from the exchange circulars, keyed by year; extend with NSE_HOLIDAYS=YYYY-MM-DD,...
+NSE_HOLIDAYS_FILE = os.getenv("NSE_HOLIDAYS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nse_holidays.json"))
+
+
+def load_holidays(path: str = NSE_HOLIDAYS_FILE) -> tuple[set, set]:
+    # Returns (holiday dates, years the calendar covers); only years listed in the file count as covered
+    with open(path) as f:
+        by_year = json.load(f)
+    holidays = {d for dates in by_year.values() for d in dates}
+    holidays |= {d.strip() for d in os.getenv("NSE_HOLIDAYS", "").split(",") if d.strip()}
+    return holidays, {int(year) for year in by_year}
+
+
+NSE_HOLIDAYS, HOLIDAY_YEARS = load_holidays()
+
+PREWARM_TIME = os.getenv("PREWARM_TIME", "09:00")
+ENTRY_TIME = os.getenv("ENTRY_TIME", "09:20")
+MONITOR_INTERVAL = int(os.getenv("MONITOR_INTERVAL", "180"))
+SCHEDULER_STATS_FILE = os.getenv("SCHEDULER_STATS_FILE", "scheduler_stats.json")
+# Worker and web dynos do not share a filesystem, so stats are also pushed to the web process when set
+SCHEDULER_STATS_URL = os.getenv("SCHEDULER_STATS_URL")
+SCHEDULER_TOKEN = os.getenv("SCHEDULER_TOKEN")
+
+
+def calendar_covers(d: date) -> bool:
+    return d.year in HOLIDAY_YEARS
+
+
+def is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and d.isoformat() not in NSE_HOLIDAYS
+
+
+def next_trading_day(d: date) -> date:
+    while not is_trading_day(d):
+        d += timedelta(days=1)
+    return d
+
+
+def is_market_open(now: datetime) -> bool:
+    return is_trading_day(now.date()) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def _parse_time(value: str) -> dtime:
+    hour, minute = value.split(":")
+    return dtime(int(hour), int(minute))
+
+
+def daily_at(at: str):
+    at = _parse_time(at)
+
+    def next_run(now: datetime) -> datetime:
+        d = next_trading_day(now.date())
+        run = datetime.combine(d, at, IST)
+        if run <= now:
+            run = datetime.combine(next_trading_day(d + timedelta(days=1)), at, IST)
+        return run
+
+    return next_run
+
+
+def every(seconds: int):
+    def next_run(now: datetime) -> datetime:
+        d = next_trading_day(now.date())
+        open_at = datetime.combine(d, MARKET_OPEN, IST)
+        close_at = datetime.combine(d, MARKET_CLOSE, IST)
+        if now < open_at:
+            return open_at
+        # Slots are anchored to the open so runs line up with the chain refresh cadence
+        slots = int((now - open_at).total_seconds() // seconds) + 1
+        run = open_at + timedelta(seconds=slots * seconds)
+        if run >= close_at:
+            return datetime.combine(next_trading_day(d + timedelta(days=1)), MARKET_OPEN, IST)
+        return run
+
+    return next_run
+
+
+def prewarm():
+    # Only data cached for the whole day is worth loading early; chains expire within CHAIN_TTL
+    helper.get_nifty_options()
+    helper.get_expiry_list()
+
+
+class Job:
+    def __init__(self, name: str, fn, schedule):
+        self.name = name
+        self.fn = fn
+        self.schedule = schedule
+        self.next_run = None
+        self.stats = {"runs": 0, "failures": 0, "last_started": None, "last_skew": None,
+                      "max_skew": 0.0, "last_runtime": None, "last_error": None}
+
+    def run(self, now: datetime):
+        skew = (now - self.next_run).total_seconds()
+        start = time.perf_counter()
+        try:
+            self.fn()
+            self.stats["last_error"] = None
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.stats["last_error"] = str(e)
+            traceback.print_exc()
+        runtime = time.perf_counter() - start
+
+        self.stats["runs"] += 1
+        self.stats["last_started"] = now.isoformat()
+        self.stats["last_skew"] = skew
+        self.stats["max_skew"] = max(self.stats["max_skew"], skew)
+        self.stats["last_runtime"] = runtime
+        print(f"[scheduler] {self.name} ran in {runtime:.2f}s (skew {skew:.2f}s)")
+
+
+def write_stats(jobs: list[Job]):
+    stats = {job.name: {**job.stats, "next_run": job.next_run.isoformat()} for job in jobs}
+    payload = {"updated_at": datetime.now(IST).isoformat(), "jobs": stats}
+
+    # Write then rename so a reader never sees a half-written file
+    directory = os.path.dirname(os.path.abspath(SCHEDULER_STATS_FILE))
+    with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+        json.dump(payload, f, indent=2)
+    os.replace(f.name, SCHEDULER_STATS_FILE)
+
+    if SCHEDULER_STATS_URL:
+        try:
+            requests.post(SCHEDULER_STATS_URL, json=payload, headers={"X-Scheduler-Token": SCHEDULER_TOKEN or ""},
+                          timeout=5).raise_for_status()
+        except Exception as e:
+            print(f"[scheduler] could not publish stats: {e}")
+
+
+def run(jobs: list[Job]):
+    now = datetime.now(IST)
+    if not calendar_covers(now.date()):
+        print(f"[scheduler] WARNING: {NSE_HOLIDAYS_FILE} has no holidays for {now.year}; jobs will not run")
+    for job in jobs:
+        job.next_run = job.schedule(now)
+        print(f"[scheduler] {job.name} next at {job.next_run.isoformat()}")
+    write_stats(jobs)
+
+    while True:
+        job = min(jobs, key=lambda j: j.next_run)
+        delay = (job.next_run - datetime.now(IST)).total_seconds()
+        if delay > 0:
+            time.sleep(min(delay, 60))
+            continue
+
+        now = datetime.now(IST)
+        if calendar_covers(now.date()):
+            # Jobs run one at a time so monitoring never races an entry in flight
+            job.run(now)
+        else:
+            # Without the year's holidays we cannot tell a trading day from a holiday, so nothing is sent
+            job.stats["last_error"] = f"no NSE holiday calendar for {now.year}"
+            print(f"[scheduler] skipping {job.name}: no NSE holiday calendar for {now.year}, update {NSE_HOLIDAYS_FILE}")
+        job.next_run = job.schedule(datetime.now(IST))
+        write_stats(jobs)
+
+
+def monitor_job(account_id: str) -> Job:
+    return Job(f"monitor:{account_id}", lambda: helper.monitor_positions(account_id=account_id), every(MONITOR_INTERVAL))
+
+
+if __name__ == "__main__":
+    # Market data is shared, so entry selects legs once for every strategy account;
+    # monitoring is per account but reads chains from the shared cache
+    strategy_accounts = [account.id for account in accounts.REGISTRY.all() if account.strategy]
+    jobs = [
+        Job("prewarm", prewarm, daily_at(PREWARM_TIME)),
+        Job("entry", lambda: helper.run_entry_for_accounts(strategy_accounts), daily_at(ENTRY_TIME)),
+    ]
+    jobs += [monitor_job(account_id) for account_id in strategy_accounts]
+    run(jobs)